@@ -1,23 +1,58 @@
+import asyncio
+import hashlib
+import json
+import math
 import os
 import re
+import signal
 import sys
+import threading
 import time
-from dataclasses import dataclass
-from enum import Enum
-from typing import List, Optional, Tuple, Dict, Any
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import List, Optional, Tuple, Dict, Any, Iterable, AsyncIterator, Callable, TypeVar
 
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from models import JudgeFeedback, Story, StoryCategory, StoryRequest
+from parsers import (
+    SECTION_MARKER_RE,
+    coerce_str_list,
+    normalize_tone,
+    parse_analyzer_response,
+    parse_choice_proposal,
+    parse_continuation_response,
+    parse_judge_and_refine_response,
+    parse_judge_response,
+    parse_literal_substitution,
+    parse_story_response,
+    safe_split_csv,
+)
 
 load_dotenv()
 
 MODEL = "gpt-3.5-turbo"
+
+# Per-stage model selection. Every stage uses MODEL unless overridden with
+# BEDTIME_MODEL_<STAGE>, e.g. BEDTIME_MODEL_ANALYZER=gpt-4o-mini.
+MODEL_STAGES = ("analyzer", "storyteller", "judge", "judge_refiner", "choice_proposer", "continuation")
+MODELS = {stage: os.getenv(f"BEDTIME_MODEL_{stage.upper()}", MODEL) for stage in MODEL_STAGES}
 MAX_REFINEMENT_ITERATIONS = 5
 JUDGE_THRESHOLD = 7
 
 API_MAX_RETRIES = 3
 API_RETRY_BACKOFF_SECONDS = 1.5
 
+# HTTP connection pool constants
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_MAX_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60.0
+HTTP_TIMEOUT_SECONDS = 60.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+
 STORY_MAX_TOKENS = 2000
 ANALYZER_MAX_TOKENS = 500
 JUDGE_MAX_TOKENS = 900
@@ -27,71 +62,39 @@ CHOICE_MODE_MAX_STEPS = 3
 CHOICE_PROPOSAL_MAX_TOKENS = 250
 CHOICE_CONTINUATION_MAX_TOKENS = 900
 
+# Response cache constants
+CACHE_DIR = os.path.expanduser(os.getenv("BEDTIME_CACHE_DIR", "~/.bedtime_cache"))
+CACHE_MAX_TEMPERATURE = 0.3  # only near-deterministic calls are cached by default
+CACHE_ALL = os.getenv("BEDTIME_CACHE_ALL") == "1"
+CACHE_TTL_DEFAULT_SECONDS = 7 * 24 * 3600.0
+try:
+    CACHE_TTL_SECONDS = float(os.getenv("BEDTIME_CACHE_TTL_SECONDS", CACHE_TTL_DEFAULT_SECONDS))
+except ValueError:
+    # A malformed override should not stop the generator from starting.
+    CACHE_TTL_SECONDS = CACHE_TTL_DEFAULT_SECONDS
+
+# Near-duplicate modification requests ("make it shorter" / "shorten the story") reuse a prior result.
+EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 64
+
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise RuntimeError("OPENAI_API_KEY is not set. Put it in your environment or a .env file.")
 
-client = OpenAI(api_key=api_key)
-
-
-class StoryCategory(Enum):
-    ADVENTURE = "adventure"
-    FANTASY = "fantasy"
-    ANIMAL = "animal"
-    FRIENDSHIP = "friendship"
-    BEDTIME = "bedtime"
-    EDUCATIONAL = "educational"
-    FUNNY = "funny"
-
-
-@dataclass
-class StoryRequest:
-    raw_input: str
-    category: StoryCategory
-    characters: List[str]
-    themes: List[str]
-    setting: str
-    tone: str
-
-
-@dataclass
-class JudgeFeedback:
-    overall_score: int  # 1-10
-    age_appropriateness: int
-    engagement: int
-    moral_clarity: int
-    story_structure: int
-    language_quality: int
-    feedback: str
-    suggestions: List[str]
+# One pooled HTTP/2 client for the whole session so calls after the first skip the TCP/TLS handshake.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    ),
+    timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+)
 
+client = AsyncOpenAI(api_key=api_key, http_client=http_client)
 
-@dataclass
-class Story:
-    title: str
-    content: str
-    moral: str
-    version: int
-
-
-def clamp_int(value: Any, lo: int, hi: int, default: int) -> int:
-    try:
-        v = int(value)
-        return max(lo, min(hi, v))
-    except Exception:
-        return default
-
-
-def safe_split_csv(text: str) -> List[str]:
-    if not text:
-        return []
-    return [x.strip() for x in text.split(",") if x.strip()]
-
-
-def normalize_tone(tone: str) -> str:
-    allowed = {"whimsical", "exciting", "calming", "humorous", "heartwarming", "inspiring"}
-    t = (tone or "").strip().lower()
-    return t if t in allowed else "whimsical"
 
 # Utility Functions
 def format_story_for_context(story: Story) -> str:
@@ -113,40 +116,362 @@ def format_feedback_for_context(feedback: JudgeFeedback, round_num: int) -> str:
     )
 
 
+# LLM Response Cache
+
+class LLMCache:
+    """Completion cache backed by one JSON file per key, with an in-process layer on top.
+
+    Entries older than ttl seconds are treated as misses and deleted when read.
+    """
+
+    def __init__(self, directory: str, ttl: float = CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        self._memory: Dict[str, Tuple[str, float]] = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                entry = (data["response"], float(data.get("created", 0.0)))
+            except Exception:
+                return None
+            self._memory[key] = entry
+        value, created = entry
+        if time.time() - created > self.ttl:
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        created = time.time()
+        self._memory[key] = (value, created)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"response": value, "created": created}, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            # A read-only or full disk should never break story generation.
+            pass
+
+
+llm_cache = LLMCache(CACHE_DIR)
+
+
+def make_cache_key(
+    model: str, prompt: str, system_prompt: str, max_tokens: int, temperature: float, json_mode: bool = False
+) -> str:
+    payload = {
+        "model": model,
+        "system": system_prompt,
+        "user": prompt,
+        "max_tokens": max_tokens,
+        "temp": round(temperature, 2),
+        "json": json_mode,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature: float) -> bool:
+    return CACHE_ALL or temperature <= CACHE_MAX_TEMPERATURE
+
+
+class SemanticCache:
+    """In-process LRU of (scope, unit embedding) -> Story, matched by cosine similarity.
+
+    The scope pins a match to the same base story and request, so only the wording of
+    the instruction is allowed to vary.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[str, List[float], Story]]" = OrderedDict()
+        self._next_id = 0
+
+    def get(self, scope: str, embedding: List[float]) -> Optional[Story]:
+        best_id, best_sim = None, self.threshold
+        for entry_id, (entry_scope, vector, _) in self._entries.items():
+            if entry_scope != scope:
+                continue
+            sim = sum(a * b for a, b in zip(vector, embedding))
+            if sim >= best_sim:
+                best_id, best_sim = entry_id, sim
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id][2]
+
+    def has_scope(self, scope: str) -> bool:
+        return any(entry_scope == scope for entry_scope, _, _ in self._entries.values())
+
+    def set(self, scope: str, embedding: List[float], story: Story) -> None:
+        self._entries[self._next_id] = (scope, embedding, story)
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+semantic_cache = SemanticCache()
+
+
 # LLM Interaction with Retries
 
-def call_model(
+def prompt_cache_scope(request: StoryRequest) -> str:
+    """Routing hint for OpenAI prompt caching; calls sharing it share a static prompt prefix."""
+    return f"bedtime-{request.category.value}"
+
+
+def build_messages(prompt: str, system_prompt: str) -> List[Dict[str, str]]:
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+# Identical requests that are already in flight are shared instead of re-sent.
+_inflight: Dict[str, asyncio.Task] = {}
+_inflight_waiters: Dict[str, int] = {}
+
+
+async def call_model(
     prompt: str,
     system_prompt: str = "",
     max_tokens: int = 3000,
     temperature: float = 0.7,
+    cache_scope: Optional[str] = None,
+    json_mode: bool = False,
+    stage: str = "storyteller",
+    use_cache: bool = True,
 ) -> str:
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
+    """Returns the completion text. use_cache=False skips the cache lookup but still stores the result."""
+    model = MODELS[stage]
+    key = make_cache_key(model, prompt, system_prompt, max_tokens, temperature, json_mode)
+    cacheable = is_cacheable(temperature)
+    if cacheable and use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    options: Dict[str, Any] = {}
+    if cache_scope:
+        options["extra_body"] = {"prompt_cache_key": cache_scope}
+    if json_mode:
+        options["response_format"] = {"type": "json_object"}
+
+    task = _inflight.get(key)
+    if task is None or task.done():
+        task = asyncio.create_task(
+            request_completion(model, build_messages(prompt, system_prompt), max_tokens, temperature, options)
+        )
+        _inflight[key] = task
+        _inflight_waiters[key] = 0
+        task.add_done_callback(lambda done: forget_inflight(key, done))
+
+    _inflight_waiters[key] += 1
+    try:
+        # shield() keeps one cancelled caller from cancelling the request for the others.
+        content = await asyncio.shield(task)
+    finally:
+        if _inflight.get(key) is task:
+            _inflight_waiters[key] -= 1
+            if _inflight_waiters[key] == 0 and not task.done():
+                task.cancel()
+
+    if cacheable and content:
+        llm_cache.set(key, content)
+    return content
+
+
+T = TypeVar("T")
+
+
+async def call_model_parsed(parse: Callable[[str], T], prompt: str, system_prompt: str = "", **kwargs: Any) -> T:
+    """call_model for replies that must parse.
+
+    A reply that parse() rejects with ValueError (e.g. JSON cut off at max_tokens) is
+    requested again, bypassing the cache, up to API_MAX_RETRIES times.
+    """
+    last_err: Optional[Exception] = None
+    for attempt in range(1, API_MAX_RETRIES + 1):
+        response = await call_model(prompt, system_prompt, use_cache=attempt == 1, **kwargs)
+        try:
+            return parse(response)
+        except ValueError as e:
+            last_err = e
+
+    raise RuntimeError(f"Model reply could not be parsed after {API_MAX_RETRIES} attempts: {last_err}")
 
+
+def forget_inflight(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+        del _inflight_waiters[key]
+
+
+async def request_completion(
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    options: Dict[str, Any],
+) -> str:
     last_err: Optional[Exception] = None
     for attempt in range(1, API_MAX_RETRIES + 1):
         try:
-            response = client.chat.completions.create(
-                model=MODEL,
+            response = await client.chat.completions.create(
+                model=model,
                 messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                **options,
             )
-            content = response.choices[0].message.content
-            return content or ""
+            return response.choices[0].message.content or ""
         except Exception as e:
             last_err = e
             if attempt < API_MAX_RETRIES:
-                time.sleep(API_RETRY_BACKOFF_SECONDS * attempt)
+                await asyncio.sleep(API_RETRY_BACKOFF_SECONDS * attempt)
             else:
                 break
 
     raise RuntimeError(f"OpenAI API call failed after {API_MAX_RETRIES} attempts: {last_err}")
 
 
+async def embed_text(text: str) -> Optional[List[float]]:
+    """Returns a unit-length embedding, or None if the endpoint fails (callers then skip the semantic cache)."""
+    try:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    except Exception:
+        return None
+    vector = response.data[0].embedding
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else None
+
+
+async def prewarm_connection() -> None:
+    """Opens a pooled connection before the first real call needs it; failures are ignored."""
+    try:
+        await client.models.list()
+    except Exception:
+        pass
+
+
+async def call_model_stream(
+    prompt: str,
+    system_prompt: str = "",
+    max_tokens: int = 3000,
+    temperature: float = 0.7,
+    cache_scope: Optional[str] = None,
+    stage: str = "storyteller",
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """Yields completion text fragments as they arrive.
+
+    Only opening the stream is retried; an error after the first fragment propagates.
+    """
+    messages = build_messages(prompt, system_prompt)
+
+    model = MODELS[stage]
+    cache_key = make_cache_key(model, prompt, system_prompt, max_tokens, temperature) if is_cacheable(temperature) else None
+    if cache_key and use_cache:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    options: Dict[str, Any] = {}
+    if cache_scope:
+        options["extra_body"] = {"prompt_cache_key": cache_scope}
+
+    stream = None
+    last_err: Optional[Exception] = None
+    for attempt in range(1, API_MAX_RETRIES + 1):
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                **options,
+            )
+            break
+        except Exception as e:
+            last_err = e
+            if attempt < API_MAX_RETRIES:
+                await asyncio.sleep(API_RETRY_BACKOFF_SECONDS * attempt)
+
+    if stream is None:
+        raise RuntimeError(f"OpenAI API call failed after {API_MAX_RETRIES} attempts: {last_err}")
+
+    parts: List[str] = []
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    if cache_key and content:
+        llm_cache.set(cache_key, content)
+
+
+async def cancel_tasks(tasks: Iterable[asyncio.Task]) -> None:
+    """Cancels speculative tasks and swallows their results or errors."""
+    pending = list(tasks)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def read_input(prompt: str) -> str:
+    """input() that keeps the event loop running while the user types.
+
+    The read happens on a daemon thread rather than through asyncio.to_thread, because
+    asyncio.run waits for executor threads on shutdown and Ctrl+C at a prompt would
+    otherwise hang until Enter is pressed.
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future = loop.create_future()
+
+    def deliver(result: Optional[str], error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def worker() -> None:
+        result: Optional[str] = None
+        error: Optional[BaseException] = None
+        try:
+            result = input(prompt)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(deliver, result, error)
+        except RuntimeError:
+            pass  # the loop already closed
+
+    threading.Thread(target=worker, daemon=True).start()
+    return await future
+
+
 # Story Request Analyzer
 
 ANALYZER_SYSTEM_PROMPT = """You are a story request analyzer for a children's bedtime story generator (ages 5-10).
@@ -164,36 +489,29 @@ Do not add extra lines.
 """
 
 
-def parse_analyzer_response(response: str) -> Dict[str, str]:
-    parsed: Dict[str, str] = {}
-    for line in (response or "").strip().splitlines():
-        if ":" not in line:
-            continue
-        key, value = line.split(":", 1)
-        parsed[key.strip().upper()] = value.strip()
-    return parsed
+_CATEGORY_LOOKUP = {cat.value: cat for cat in StoryCategory}
 
 
-def analyze_request(user_input: str) -> StoryRequest:
+async def analyze_request(user_input: str) -> StoryRequest:
     prompt = f"Analyze this bedtime story request: {user_input}"
 
-    response = call_model(
+    response = await call_model(
         prompt,
         ANALYZER_SYSTEM_PROMPT,
         max_tokens=ANALYZER_MAX_TOKENS,
         temperature=0.2,
+        stage="analyzer",
     )
 
     parsed = parse_analyzer_response(response)
 
-    category_map = {cat.value: cat for cat in StoryCategory}
-    category_str = (parsed.get("CATEGORY", "bedtime") or "bedtime").strip().lower()
-    category = category_map.get(category_str, StoryCategory.BEDTIME)
+    # Parsed values are already stripped.
+    category = _CATEGORY_LOOKUP.get(parsed.get("CATEGORY", "").lower(), StoryCategory.BEDTIME)
 
     characters = safe_split_csv(parsed.get("CHARACTERS", ""))
     themes = safe_split_csv(parsed.get("THEMES", ""))
 
-    setting = parsed.get("SETTING", "").strip() or "a magical land"
+    setting = parsed.get("SETTING", "") or "a magical land"
     tone = normalize_tone(parsed.get("TONE", ""))
 
     return StoryRequest(
@@ -208,7 +526,16 @@ def analyze_request(user_input: str) -> StoryRequest:
 
 # Storyteller System
 
-def get_storyteller_system_prompt(category: StoryCategory) -> str:
+STORYTELLER_FORMAT = """FORMAT YOUR RESPONSE AS:
+TITLE: [Story Title]
+STORY:
+[The full story text]
+MORAL: [The lesson of the story in one sentence]"""
+
+
+@lru_cache(maxsize=16)
+def get_storyteller_system_prompt(category: StoryCategory, include_format: bool = True) -> str:
+    """include_format=False drops the TITLE/STORY/MORAL spec for prompts that define their own output."""
     base_prompt = """You are a master children's storyteller creating bedtime stories for ages 5-10.
 
 STORY STRUCTURE (Follow the classic story arc):
@@ -227,13 +554,9 @@ GUIDELINES:
 - Ensure a clear, positive moral lesson
 - End with a calming, sleep-inducing conclusion
 - Story length: 400-600 words
-- Avoid scary elements, violence, or anything inappropriate for young children
-
-FORMAT YOUR RESPONSE AS:
-TITLE: [Story Title]
-STORY:
-[The full story text]
-MORAL: [The lesson of the story in one sentence]"""
+- Avoid scary elements, violence, or anything inappropriate for young children"""
+    if include_format:
+        base_prompt += "\n\n" + STORYTELLER_FORMAT
 
     category_additions = {
         StoryCategory.ADVENTURE: "\n\nADVENTURE FOCUS: Include exciting discoveries, brave choices, and exploration. The character should show courage but always stay safe.",
@@ -248,35 +571,13 @@ MORAL: [The lesson of the story in one sentence]"""
     return base_prompt + category_additions.get(category, "")
 
 
-def parse_story_response(response: str, fallback_title: str = "Untitled Story") -> Tuple[str, str, str]:
-    text = response or ""
-
-    title_match = re.search(r"(?:TITLE|Title)\s*:?\s*(.*?)(?=\n|$)", text, re.IGNORECASE)
-    moral_match = re.search(r"(?:MORAL|Moral)\s*:?\s*(.*?)$", text, re.IGNORECASE | re.DOTALL)
-    story_match = re.search(
-        r"(?:STORY|Story)\s*:?\s*([\s\S]*?)(?=(?:MORAL|Moral)\s*:|$)",
-        text,
-        re.IGNORECASE,
-    )
-
-    title = title_match.group(1).strip() if title_match and title_match.group(1).strip() else fallback_title
-    moral = moral_match.group(1).strip() if moral_match else ""
-
-    if story_match and story_match.group(1).strip():
-        content = story_match.group(1).strip()
-    else:
-        content = text
-        if title_match:
-            content = content.replace(title_match.group(0), "")
-        if moral_match:
-            content = content.replace(moral_match.group(0), "")
-        content = content.strip()
-
-    content = re.sub(r"^(?:STORY|Story)\s*:?\s*", "", content, flags=re.IGNORECASE).strip()
-    return title, content, moral
-
-
-def generate_story(request: StoryRequest, improvement_context: Optional[str] = None) -> Story:
+async def generate_story(
+    request: StoryRequest,
+    improvement_context: Optional[str] = None,
+    fresh: bool = False,
+    stream: bool = False,
+) -> Story:
+    """With stream=True the draft is printed as it is generated."""
     system_prompt = get_storyteller_system_prompt(request.category)
 
     prompt = f"""Create a bedtime story with these elements:
@@ -289,17 +590,94 @@ def generate_story(request: StoryRequest, improvement_context: Optional[str] = N
     if improvement_context:
         prompt += f"\n\nIncorporate these improvement notes from prior judging:\n{improvement_context}\n"
 
-    response = call_model(prompt, system_prompt, max_tokens=STORY_MAX_TOKENS, temperature=0.8)
+    if stream:
+        return await stream_story(
+            prompt,
+            system_prompt,
+            fallback_title="Untitled Story",
+            version=1,
+            temperature=0.8,
+            cache_scope=prompt_cache_scope(request),
+            use_cache=not fresh,
+        )
+
+    response = await call_model(
+        prompt,
+        system_prompt,
+        max_tokens=STORY_MAX_TOKENS,
+        temperature=0.8,
+        cache_scope=prompt_cache_scope(request),
+        use_cache=not fresh,
+    )
     title, content, moral = parse_story_response(response, fallback_title="Untitled Story")
 
     return Story(title=title, content=content, moral=moral, version=1)
 
 
-# LLM Judge
+STORY_WITH_ANALYSIS_FORMAT = """Respond with a single JSON object instead of the TITLE/STORY/MORAL format:
+{"characters": ["..."], "themes": ["..."], "title": "...", "story": "...", "moral": "..."}
+"""
+
 
-JUDGE_SYSTEM_PROMPT = """You are a careful children's literature critic.
+async def generate_story_with_analysis(
+    user_input: str, category: StoryCategory, tone: str, setting: str
+) -> Tuple[StoryRequest, Story]:
+    """Extracts characters/themes and writes the first draft in a single JSON-mode call.
 
-SCORING RULES:
+    Menu choices already fix category, tone, and setting, so the analyzer's only
+    remaining job can ride along with the storyteller call. Raises ValueError if the
+    reply is not usable JSON.
+    """
+    request = StoryRequest(
+        raw_input=user_input,
+        category=category,
+        characters=[],
+        themes=[],
+        setting=setting.strip() or "a magical land",
+        tone=normalize_tone(tone),
+    )
+    # The user prompt asks for JSON, so leave out the TITLE/STORY/MORAL format section.
+    system_prompt = get_storyteller_system_prompt(category, include_format=False)
+
+    prompt = f"""Create a bedtime story with these elements:
+- Characters: Choose characters that fit the original request
+- Themes: Choose child-friendly themes that fit the original request
+- Setting: {request.setting}
+- Tone: {request.tone}
+- Original request: "{user_input}"
+
+{STORY_WITH_ANALYSIS_FORMAT}"""
+
+    response = await call_model(
+        prompt,
+        system_prompt,
+        max_tokens=STORY_MAX_TOKENS,
+        temperature=0.8,
+        cache_scope=prompt_cache_scope(request),
+        json_mode=True,
+    )
+
+    try:
+        data = json.loads(response)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"story response was not valid JSON: {e}") from e
+    if not isinstance(data, dict) or not str(data.get("story") or "").strip():
+        raise ValueError("story response did not include a story")
+
+    request.characters = coerce_str_list(data.get("characters"))
+    request.themes = coerce_str_list(data.get("themes"))
+    story = Story(
+        title=str(data.get("title") or "").strip() or "Untitled Story",
+        content=str(data["story"]).strip(),
+        moral=str(data.get("moral") or "").strip(),
+        version=1,
+    )
+    return request, story
+
+
+# LLM Judge
+
+JUDGE_RULES = """SCORING RULES:
 - Round 1: Be critical. Cap scores at 6/10 unless perfection.
 - Round 2+: REWARD IMPROVEMENT. If the story fixed previous issues, the score MUST go up.
 - Be honest. If it got worse, lower the score.
@@ -312,79 +690,71 @@ EVALUATION CRITERIA (1-10):
 5. LANGUAGE_QUALITY (Vivid descriptions?)
 
 IMPORTANT FORMATTING:
-- Your FEEDBACK section must be a single paragraph summary.
-- Do NOT list the scores again inside the FEEDBACK section.
-- Put detailed bullet points ONLY in the SUGGESTIONS section.
-
-Respond in this exact format:
-OVERALL_SCORE: [1-10]
-AGE_APPROPRIATENESS: [1-10]
-ENGAGEMENT: [1-10]
-MORAL_CLARITY: [1-10]
-STORY_STRUCTURE: [1-10]
-LANGUAGE_QUALITY: [1-10]
-FEEDBACK: [2-3 sentences summarizing the critique. Do not repeat scores here.]
-SUGGESTIONS:
-- [bullet 1]
-- [bullet 2]
+- "feedback" must be a single paragraph summary.
+- Do NOT list the scores again inside "feedback".
+- Put detailed, actionable points ONLY in "suggestions".
 """
 
+JUDGE_JSON_SHAPE = """{
+  "overall_score": <1-10>,
+  "age_appropriateness": <1-10>,
+  "engagement": <1-10>,
+  "moral_clarity": <1-10>,
+  "story_structure": <1-10>,
+  "language_quality": <1-10>,
+  "feedback": "<2-3 sentences summarizing the critique. Do not repeat scores here.>",
+  "suggestions": ["<suggestion 1>", "<suggestion 2>"]
+}"""
+
+JUDGE_SYSTEM_PROMPT = f"""You are a careful children's literature critic.
+
+{JUDGE_RULES}
+Respond with a single JSON object in exactly this shape:
+{JUDGE_JSON_SHAPE}
+"""
 
-def parse_judge_response(response: str) -> JudgeFeedback:
-    text = response or ""
+STATIC_JUDGE_INSTRUCTIONS = """Evaluate the story draft below using the scoring rules and format above.
 
-    def find_score(pattern: str, default: int) -> int:
-        m = re.search(pattern, text, re.IGNORECASE)
-        if not m:
-            return default
-        return clamp_int(m.group(1), 1, 10, default)
+"""
 
-    overall = find_score(r"(?:OVERALL[_\s]?SCORE|Overall Score)\s*:?\s*(\d+)", 5)
-    age = find_score(r"(?:AGE[_\s]?APPROPRIATENESS|Age Appropriateness)\s*:?\s*(\d+)", 5)
-    eng = find_score(r"(?:ENGAGEMENT|Engagement)\s*:?\s*(\d+)", 5)
-    moral = find_score(r"(?:MORAL[_\s]?CLARITY|Moral Clarity)\s*:?\s*(\d+)", 5)
-    struct = find_score(r"(?:STORY[_\s]?STRUCTURE|Story Structure)\s*:?\s*(\d+)", 5)
-    lang = find_score(r"(?:LANGUAGE[_\s]?QUALITY|Language Quality)\s*:?\s*(\d+)", 5)
+# Static chunks of the judge user prompt; build_judge_prompt joins them with the per-call values.
+_JUDGE_TEMPLATE_PARTS = (
+    STATIC_JUDGE_INSTRUCTIONS + 'REQUEST: "',
+    '"\nCATEGORY: ',
+    "\nTONE: ",
+    "\nSETTING: ",
+    "\n\nROUND: ",
+    "\n\nSTORY:\n",
+    "\n\nCONTEXT:\n",
+    "\n",
+    "\n",
+)
 
-    feedback_match = re.search(
-        r"(?:FEEDBACK|Feedback)\s*:?\s*(.*?)(?=(?:SUGGESTIONS|Suggestions)\s*:|$)",
-        text,
-        re.IGNORECASE | re.DOTALL,
-    )
-    feedback = feedback_match.group(1).strip() if feedback_match else ""
-
-    suggestions: List[str] = []
-    suggestions_match = re.search(r"(?:SUGGESTIONS|Suggestions)\s*:?\s*(.*?)$", text, re.IGNORECASE | re.DOTALL)
-    if suggestions_match:
-        suggestions_text = suggestions_match.group(1).strip()
-        bullet_lines = re.findall(r"[-•*]\s*(.+)", suggestions_text)
-        suggestions = [s.strip() for s in bullet_lines if s.strip()]
-        if not suggestions and suggestions_text:
-            suggestions = [suggestions_text]
-
-    return JudgeFeedback(
-        overall_score=overall,
-        age_appropriateness=age,
-        engagement=eng,
-        moral_clarity=moral,
-        story_structure=struct,
-        language_quality=lang,
-        feedback=feedback,
-        suggestions=suggestions,
-    )
+_FIRST_ROUND_CONTEXT = "This is a first draft. Be extremely critical. Do not give a score higher than 6 unless it is a masterpiece."
 
 
-def judge_story(
+async def judge_story(
     story: Story,
     request: StoryRequest,
     round_num: int = 1,
     history: Optional[List[JudgeFeedback]] = None,
 ) -> JudgeFeedback:
-    history = history or []
+    return await call_model_parsed(
+        parse_judge_response,
+        build_judge_prompt(story, request, round_num, history or []),
+        JUDGE_SYSTEM_PROMPT,
+        max_tokens=JUDGE_MAX_TOKENS,
+        temperature=0.4,
+        cache_scope=prompt_cache_scope(request),
+        json_mode=True,
+        stage="judge",
+    )
+
 
+def build_judge_prompt(story: Story, request: StoryRequest, round_num: int, history: List[JudgeFeedback]) -> str:
     round_context = ""
     if round_num == 1:
-        round_context = "This is a first draft. Be extremely critical. Do not give a score higher than 6 unless it is a masterpiece."
+        round_context = _FIRST_ROUND_CONTEXT
     elif round_num > 1:
         round_context = f"This is revision #{round_num}. Check if they fixed the previous issues. You can raise the score if they did."
 
@@ -394,27 +764,50 @@ def judge_story(
     else:
         previous_context = ""
 
-    system_prompt = JUDGE_SYSTEM_PROMPT 
+    # Everything that changes between rounds comes after the shared request block
+    # so repeat rounds reuse the longest possible cached prefix.
+    parts = _JUDGE_TEMPLATE_PARTS
+    return "".join((
+        parts[0], request.raw_input,
+        parts[1], request.category.value,
+        parts[2], request.tone,
+        parts[3], request.setting,
+        parts[4], str(round_num),
+        parts[5], format_story_for_context(story),
+        parts[6], round_context,
+        parts[7], previous_context,
+        parts[8],
+    ))
 
-    prompt = f"""Evaluate this draft (Round {round_num}):
 
-REQUEST: "{request.raw_input}"
-CATEGORY: {request.category.value}
-TONE: {request.tone}
+# Story Refinement
 
-STORY:
-{format_story_for_context(story)}
+# Static chunks of the refinement prompt; refine_story joins them with the per-call values.
+_REFINE_TEMPLATE_PARTS = (
+    """Revise this children's story using the judge's critique.
 
-CONTEXT:
-{round_context}
-{previous_context}
-"""
+GOALS:
+- Keep it suitable for ages 5-10
+- Match the requested category, tone, and setting
+- Keep the moral positive and not preachy
+- Improve weak areas called out by the judge
 
-    response = call_model(prompt, system_prompt, max_tokens=JUDGE_MAX_TOKENS, temperature=0.4)
-    return parse_judge_response(response)
+REQUEST DETAILS:
+- Category: """,
+    "\n- Tone: ",
+    "\n- Setting: ",
+    "\n\nCURRENT STORY:\n",
+    "\n\nIMPROVEMENT NOTES:\n",
+    """
 
+Return the full revised story in this format:
+TITLE: [Title]
+STORY:
+[Full story]
+MORAL: [Moral]
+""",
+)
 
-# Story Refinement
 
 def build_improvement_context(history: List[JudgeFeedback]) -> str:
     if not history:
@@ -430,59 +823,83 @@ def build_improvement_context(history: List[JudgeFeedback]) -> str:
     )
 
 
-def refine_story(story: Story, request: StoryRequest, history: List[JudgeFeedback]) -> Story:
+async def refine_story(story: Story, request: StoryRequest, history: List[JudgeFeedback]) -> Story:
     system_prompt = get_storyteller_system_prompt(request.category)
 
     improvement_context = build_improvement_context(history)
 
-    prompt = f"""Revise this children's story using the judge's critique.
+    parts = _REFINE_TEMPLATE_PARTS
+    prompt = "".join((
+        parts[0], request.category.value,
+        parts[1], request.tone,
+        parts[2], request.setting,
+        parts[3], format_story_for_context(story),
+        parts[4], improvement_context,
+        parts[5],
+    ))
+
+    response = await call_model(
+        prompt,
+        system_prompt,
+        max_tokens=STORY_MAX_TOKENS,
+        temperature=0.7,
+        cache_scope=prompt_cache_scope(request),
+    )
+    title, content, moral = parse_story_response(response, fallback_title=story.title)
 
-GOALS:
-- Keep it suitable for ages 5-10
-- Match the requested category, tone, and setting
-- Keep the moral positive and not preachy
-- Improve weak areas called out by the judge
+    return Story(title=title, content=content, moral=moral, version=story.version + 1)
 
-REQUEST DETAILS:
-- Category: {request.category.value}
-- Tone: {request.tone}
-- Setting: {request.setting}
 
-CURRENT STORY:
-{format_story_for_context(story)}
+@lru_cache(maxsize=16)
+def get_judge_and_refine_system_prompt(category: StoryCategory) -> str:
+    return f"""You review and then revise children's bedtime stories (ages 5-10) in a single reply.
 
-IMPROVEMENT NOTES:
-{improvement_context}
+STEP 1 - REVIEW AS A CAREFUL CHILDREN'S LITERATURE CRITIC
+{JUDGE_RULES}
+STEP 2 - REVISE AS THE STORYTELLER
+If overall_score is {JUDGE_THRESHOLD} or higher, set "revised_story" to null.
+Otherwise rewrite the full story so it fixes every point in your suggestions, following this guidance:
 
-Return the full revised story in this format:
-TITLE: [Title]
-STORY:
-[Full story]
-MORAL: [Moral]
+{get_storyteller_system_prompt(category, include_format=False)}
+
+Respond with a single JSON object in exactly this shape:
+{{
+  "judge": {JUDGE_JSON_SHAPE},
+  "revised_story": {{"title": "<title>", "content": "<full story text>", "moral": "<one sentence>"}} or null
+}}
 """
 
-    response = call_model(prompt, system_prompt, max_tokens=STORY_MAX_TOKENS, temperature=0.7)
-    title, content, moral = parse_story_response(response, fallback_title=story.title)
 
-    return Story(title=title, content=content, moral=moral, version=story.version + 1)
+async def judge_and_refine(
+    story: Story,
+    request: StoryRequest,
+    round_num: int,
+    history: List[JudgeFeedback],
+) -> Tuple[JudgeFeedback, Optional[Story]]:
+    """Judges the story and, when it falls short, returns the revision from the same call.
+
+    The revision is None if the story met the threshold or the reply had no usable revision.
+    """
+    return await call_model_parsed(
+        lambda response: parse_judge_and_refine_response(
+            response, fallback_title=story.title, version=story.version + 1
+        ),
+        build_judge_prompt(story, request, round_num, history),
+        get_judge_and_refine_system_prompt(request.category),
+        max_tokens=JUDGE_MAX_TOKENS + STORY_MAX_TOKENS,
+        # The judge's temperature: these scores feed the plateau and regression stops.
+        temperature=0.4,
+        cache_scope=prompt_cache_scope(request),
+        json_mode=True,
+        stage="judge_refiner",
+    )
 
 
 # User Feedback and Modification
 
-def get_user_modification_prompt(user_feedback: str, story: Story, request: StoryRequest) -> str:
-    return f"""The user wants changes to this story.
-
-REQUEST DETAILS:
-- Category: {request.category.value}
-- Tone: {request.tone}
-- Setting: {request.setting}
-
-CURRENT STORY:
-{format_story_for_context(story)}
-
-USER'S REQUEST: "{user_feedback}"
+STATIC_MODIFICATION_INSTRUCTIONS = """The user wants changes to the story below.
 
-Please modify the story to incorporate the user's feedback while maintaining:
+Modify the story to incorporate the user's request while maintaining:
 - Age-appropriate content (5-10 years)
 - A clear story arc (opening, challenge, climax, resolution)
 - A positive moral lesson
@@ -493,16 +910,114 @@ TITLE: [Title]
 STORY:
 [Full modified story]
 MORAL: [Moral]
+
 """
 
 
-def apply_user_modification(story: Story, request: StoryRequest, modification: str) -> Story:
+def get_user_modification_prompt(user_feedback: str, story: Story, request: StoryRequest) -> str:
+    # Static instructions first, then the story, then the user's words, so repeated
+    # change requests on the same story share the longest cacheable prefix.
+    return f"""{STATIC_MODIFICATION_INSTRUCTIONS}REQUEST DETAILS:
+- Category: {request.category.value}
+- Tone: {request.tone}
+- Setting: {request.setting}
+
+CURRENT STORY:
+{format_story_for_context(story)}
+
+USER'S REQUEST: "{user_feedback}"
+"""
+
+
+def substitute_literal(story: Story, old: str, new: str) -> Optional[Story]:
+    """Renames whole-word occurrences of old.
+
+    Returns None if old never appears, or also appears in another spelling ("the bear"
+    next to "Bear"), since a partial rename is worse than asking the model.
+    """
+    pattern = re.compile(rf"(?<!\w){re.escape(old)}(?!\w)")
+    any_case = re.compile(pattern.pattern, re.IGNORECASE)
+    texts = (story.title, story.content, story.moral)
+    if not any(pattern.search(text) for text in texts):
+        return None
+    if any(m.group() != old for text in texts for m in any_case.finditer(text)):
+        return None
+    return Story(
+        # A function replacement keeps backslashes in the new name literal.
+        title=pattern.sub(lambda _m: new, story.title),
+        content=pattern.sub(lambda _m: new, story.content),
+        moral=pattern.sub(lambda _m: new, story.moral),
+        version=story.version + 1,
+    )
+
+
+async def apply_user_modification(story: Story, request: StoryRequest, modification: str, stream: bool = False) -> Story:
+    """With stream=True the revised story is printed as it is generated.
+
+    A plain rename ("change Alice to Bob") is applied locally without a model call. When
+    creative calls are cacheable, a near-duplicate instruction for the same story
+    returns the earlier revision instead of calling the model again.
+    """
+    substitution = parse_literal_substitution(modification)
+    if substitution is not None:
+        renamed = substitute_literal(story, *substitution)
+        if renamed is not None:
+            if stream:
+                display_story(renamed)
+            return renamed
+
     prompt = get_user_modification_prompt(modification, story, request)
     system_prompt = get_storyteller_system_prompt(request.category)
+    temperature = 0.7
+
+    embedding: Optional[List[float]] = None
+    embed_task: Optional[asyncio.Task] = None
+    scope = ""
+    if is_cacheable(temperature):
+        # Everything but the instruction itself must match for a semantic hit.
+        scope = hashlib.sha256(get_user_modification_prompt("", story, request).encode("utf-8")).hexdigest()
+        if semantic_cache.has_scope(scope):
+            embedding = await embed_text(modification)
+            cached = semantic_cache.get(scope, embedding) if embedding else None
+            if cached is not None:
+                revised = replace(cached, version=story.version + 1)
+                if stream:
+                    display_story(revised)
+                return revised
+        else:
+            # Nothing to match yet, so only embed for storing, alongside the completion.
+            embed_task = asyncio.create_task(embed_text(modification))
 
-    response = call_model(prompt, system_prompt, max_tokens=STORY_MAX_TOKENS, temperature=0.7)
-    title, content, moral = parse_story_response(response, fallback_title=story.title)
-    return Story(title=title, content=content, moral=moral, version=story.version + 1)
+    try:
+        if stream:
+            revised = await stream_story(
+                prompt,
+                system_prompt,
+                fallback_title=story.title,
+                version=story.version + 1,
+                temperature=temperature,
+                cache_scope=prompt_cache_scope(request),
+            )
+        else:
+            response = await call_model(
+                prompt,
+                system_prompt,
+                max_tokens=STORY_MAX_TOKENS,
+                temperature=temperature,
+                cache_scope=prompt_cache_scope(request),
+            )
+            title, content, moral = parse_story_response(response, fallback_title=story.title)
+            revised = Story(title=title, content=content, moral=moral, version=story.version + 1)
+    except BaseException:
+        if embed_task is not None:
+            await cancel_tasks([embed_task])
+        raise
+
+    if embed_task is not None:
+        embedding = await embed_task
+    if embedding:
+        semantic_cache.set(scope, embedding, revised)
+    return revised
 
 
 # Interactive Choice Mode (Micro Choose-Your-Own-Adventure)
@@ -521,29 +1036,7 @@ CHOICE_1: ...
 CHOICE_2: ...
 """
 
-def parse_choice_proposal(text: str) -> Tuple[str, str]:
-    c1_match = re.search(r"CHOICE_1\s*:\s*(.+)", text or "", re.IGNORECASE)
-    c2_match = re.search(r"CHOICE_2\s*:\s*(.+)", text or "", re.IGNORECASE)
-    c1 = (c1_match.group(1).strip() if c1_match else "")
-    c2 = (c2_match.group(1).strip() if c2_match else "")
-
-    # Fallback: try numbered lines
-    if not c1 or not c2:
-        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
-        numbered = [re.sub(r"^\s*[12][\)\.]\s*", "", ln).strip() for ln in lines if re.match(r"^\s*[12][\)\.]\s*", ln)]
-        if len(numbered) >= 2:
-            c1, c2 = numbered[0], numbered[1]
-
-    # Last-resort defaults
-    if not c1:
-        c1 = "Follow a trail of twinkling lights to see where it leads."
-    if not c2:
-        c2 = "Ask a friendly neighbor for help and a cozy hint."
-
-    return c1, c2
-
-
-def propose_next_choices(story: Story, request: StoryRequest, step_num: int, total_steps: int) -> Tuple[str, str]:
+async def propose_next_choices(story: Story, request: StoryRequest, step_num: int, total_steps: int) -> Tuple[str, str]:
     prompt = f"""Propose two next-step options.
 
 CONTEXT:
@@ -556,51 +1049,36 @@ STORY SO FAR:
 {format_story_for_context(story)}
 """
 
-    resp = call_model(
+    resp = await call_model(
         prompt=prompt,
         system_prompt=CHOICE_PROPOSER_SYSTEM_PROMPT,
         max_tokens=CHOICE_PROPOSAL_MAX_TOKENS,
         temperature=0.5,
+        stage="choice_proposer",
     )
     return parse_choice_proposal(resp)
 
 
-def parse_continuation_response(text: str) -> Tuple[str, str]:
-    """Returns (continuation_text, moral_or_empty)."""
-    t = text or ""
-
-    cont_match = re.search(
-        r"(?:CONTINUATION)\s*:?(.*?)(?=(?:MORAL)\s*:|$)",
-        t,
-        re.IGNORECASE | re.DOTALL,
-    )
-    moral_match = re.search(r"(?:MORAL)\s*:?(.*)$", t, re.IGNORECASE | re.DOTALL)
-
-    continuation = cont_match.group(1).strip() if cont_match and cont_match.group(1).strip() else t.strip()
-    continuation = re.sub(r"^CONTINUATION\s*:?", "", continuation, flags=re.IGNORECASE).strip()
-    moral = moral_match.group(1).strip() if moral_match else ""
-
-    return continuation, moral
-
-
-def generate_continuation(story: Story, request: StoryRequest, chosen_option: str, step_num: int, total_steps: int) -> Tuple[str, str]:
+async def generate_continuation(story: Story, request: StoryRequest, chosen_option: str, step_num: int, total_steps: int) -> Tuple[str, str]:
     is_final = step_num >= total_steps
 
     system_prompt = get_storyteller_system_prompt(request.category)
 
+    # Static constraints and the shared story come first so that both speculative
+    # branches of a step reuse the same cached prompt prefix.
     prompt = f"""Continue the bedtime story in an interactive way.
 
-STORY SO FAR:
-{format_story_for_context(story)}
-
-USER CHOSEN OPTION:
-{chosen_option}
-
 CONSTRAINTS:
 - Ages 5-10, safe and not scary
 - Keep it consistent with the setting and tone
 - Write 120-200 words
 - Continue smoothly from the last sentence
+
+STORY SO FAR:
+{format_story_for_context(story)}
+
+USER CHOSEN OPTION:
+{chosen_option}
 """
 
     if is_final:
@@ -626,17 +1104,19 @@ CONTINUATION:
 [continuation text]
 """
 
-    resp = call_model(
+    resp = await call_model(
         prompt=prompt,
         system_prompt=system_prompt,
         max_tokens=CHOICE_CONTINUATION_MAX_TOKENS,
         temperature=0.8,
+        cache_scope=prompt_cache_scope(request),
+        stage="continuation",
     )
 
     return parse_continuation_response(resp)
 
 
-def run_interactive_choice_mode(story: Story, request: StoryRequest, total_steps: int = CHOICE_MODE_MAX_STEPS) -> Story:
+async def run_interactive_choice_mode(story: Story, request: StoryRequest, total_steps: int = CHOICE_MODE_MAX_STEPS) -> Story:
     """Adds up to `total_steps` interactive continuation beats to the story."""
     current = story
 
@@ -645,24 +1125,34 @@ def run_interactive_choice_mode(story: Story, request: StoryRequest, total_steps
     print("Pick 1 or 2 at each step. Type 'quit' to exit this mode.")
     print("=" * 60 + "\n")
 
+    proposals = asyncio.create_task(propose_next_choices(current, request, step_num=1, total_steps=total_steps))
+
     for step in range(1, total_steps + 1):
-        c1, c2 = propose_next_choices(current, request, step_num=step, total_steps=total_steps)
+        c1, c2 = await proposals
 
         print(f"Step {step}/{total_steps} choices:")
         print(f"  [1] {c1}")
         print(f"  [2] {c2}")
 
+        # Speculatively write both continuations while the reader decides; the
+        # branch that is not picked gets cancelled.
+        candidates = {
+            "1": asyncio.create_task(generate_continuation(current, request, c1, step_num=step, total_steps=total_steps)),
+            "2": asyncio.create_task(generate_continuation(current, request, c2, step_num=step, total_steps=total_steps)),
+        }
+
         while True:
-            pick = input("\nYour choice (1/2 or 'quit'): ").strip().lower()
+            pick = (await read_input("\nYour choice (1/2 or 'quit'): ")).strip().lower()
             if pick in {"quit", "q", "exit"}:
+                await cancel_tasks(candidates.values())
                 print("\nExiting Interactive Choice Mode.\n")
                 return current
             if pick in {"1", "2"}:
                 break
             print("Please enter 1, 2, or 'quit'.")
 
-        chosen = c1 if pick == "1" else c2
-        continuation, maybe_moral = generate_continuation(current, request, chosen, step_num=step, total_steps=total_steps)
+        await cancel_tasks(task for key, task in candidates.items() if key != pick)
+        continuation, maybe_moral = await candidates[pick]
 
         # Append continuation to story
         new_content = (current.content.rstrip() + "\n\n" + continuation.strip()).strip()
@@ -675,6 +1165,13 @@ def run_interactive_choice_mode(story: Story, request: StoryRequest, total_steps
             version=current.version + 1,
         )
 
+        is_done = bool(maybe_moral.strip()) or step >= total_steps
+        if not is_done:
+            # Fetch the next pair of choices while the continuation is on screen.
+            proposals = asyncio.create_task(
+                propose_next_choices(current, request, step_num=step + 1, total_steps=total_steps)
+            )
+
         print("\n" + "-" * 60)
         print("Continuation:")
         print(continuation.strip())
@@ -694,13 +1191,7 @@ def run_interactive_choice_mode(story: Story, request: StoryRequest, total_steps
 # Display and Output Functions
 
 def display_story(story: Story):
-    print("\n" + "=" * 60)
-    print(story.title)
-    print("=" * 60 + "\n")
-    print(story.content)
-    print("\n" + "-" * 60)
-    print(f"Moral: {story.moral}")
-    print("=" * 60 + "\n")
+    sys.stdout.write("\n" + story.save_text + "\n")
 
 
 def display_judge_feedback(feedback: JudgeFeedback, show_details: bool = False):
@@ -719,54 +1210,217 @@ def display_judge_feedback(feedback: JudgeFeedback, show_details: bool = False):
                 print(f"    - {s}")
 
 
+SENTENCE_ENDINGS = (".", "!", "?")
+
+
+def write_paced(words: List[str], speed: float, sentence_pause: bool = True) -> bool:
+    """Writes words one at a time against a perf_counter deadline so sleep jitter never accumulates.
+
+    Ctrl+C stops the pacing, not the text: the remaining words are written at once and
+    True is returned.
+    """
+    pauses = [speed * 2 if sentence_pause and w.endswith(SENTENCE_ENDINGS) else 0.0 for w in words]
+    written = 0
+    target = time.perf_counter()
+    try:
+        for word, pause in zip(words, pauses):
+            target += speed + pause
+            sys.stdout.write(word + " ")
+            written += 1
+            sys.stdout.flush()
+            remaining = target - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+    except KeyboardInterrupt:
+        sys.stdout.write("".join(word + " " for word in words[written:]))
+        sys.stdout.flush()
+        return True
+    return False
+
+
 def speak_story(story: Story, speed: float = 0.3):
+    """Narrates the story slowly. After a Ctrl+C the rest is printed without pauses."""
+    skipped = False
+
+    def pause(seconds: float) -> None:
+        nonlocal skipped
+        if skipped:
+            return
+        try:
+            time.sleep(seconds)
+        except KeyboardInterrupt:
+            skipped = True
+
     print("\n" + "=" * 60)
     print("Bedtime Reading Mode Activated...")
     print("=" * 60 + "\n")
 
     print("")
-    for char in story.title:
-        sys.stdout.write(char)
-        sys.stdout.flush()
-        time.sleep(0.05)
+    sys.stdout.write(story.title)
+    sys.stdout.flush()
+    pause(len(story.title) * 0.05)
     print("\n")
-    time.sleep(0.5)
+    pause(0.5)
 
-    for word in story.content.split():
-        sys.stdout.write(word + " ")
-        sys.stdout.flush()
-        time.sleep(speed)
-        if word.endswith((".", "!", "?")):
-            time.sleep(speed * 2)
+    skipped = write_paced(story.content.split(), 0.0 if skipped else speed) or skipped
 
     print("\n\n" + "-" * 60)
-    time.sleep(0.5)
+    pause(0.5)
 
     print("Moral: ", end="")
-    for word in story.moral.split():
-        sys.stdout.write(word + " ")
-        sys.stdout.flush()
-        time.sleep(speed)
+    skipped = write_paced(story.moral.split(), 0.0 if skipped else speed, sentence_pause=False) or skipped
 
     print("\n" + "=" * 60)
-    time.sleep(1)
+    pause(1)
     print("\nThe End. Sweet dreams...\n")
-    time.sleep(1)
+    pause(1)
+
+
+# Section markers may arrive split across stream fragments, so this much text is held back.
+STREAM_MARKER_HOLDBACK = 24
+
+class StorySectionStream:
+    """Incrementally splits streamed TITLE/STORY/MORAL output into (section, text) pieces."""
+
+    def __init__(self):
+        self.section = "preamble"
+        self._buffer = ""
+        self._line_start = True
+
+    def feed(self, fragment: str) -> List[Tuple[str, str]]:
+        self._buffer += fragment
+        return self._drain(final=False)
+
+    def close(self) -> List[Tuple[str, str]]:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Tuple[str, str]]:
+        pieces: List[Tuple[str, str]] = []
+        while True:
+            m = SECTION_MARKER_RE.search(self._buffer)
+            if m and m.start() == 0 and not self._line_start:
+                # The buffer starts mid-line, so a marker here is just story text.
+                m = SECTION_MARKER_RE.search(self._buffer, 1)
+            if not m or (m.end() == len(self._buffer) and not final):
+                # Wait for more text before committing a marker that may still be growing.
+                break
+            self._take(pieces, self._buffer[:m.start()])
+            self.section = m.group(1).lower()
+            self._buffer = self._buffer[m.end():]
+            self._line_start = False
+
+        if final:
+            cut = len(self._buffer)
+        else:
+            cut = max(0, min(len(self._buffer) - STREAM_MARKER_HOLDBACK, m.start() if m else len(self._buffer)))
+        self._take(pieces, self._buffer[:cut])
+        self._buffer = self._buffer[cut:]
+        return pieces
+
+    def _take(self, pieces: List[Tuple[str, str]], text: str) -> None:
+        if text:
+            pieces.append((self.section, text))
+            self._line_start = text.endswith("\n")
+
+
+async def stream_story(
+    prompt: str,
+    system_prompt: str,
+    fallback_title: str,
+    version: int,
+    temperature: float = 0.7,
+    cache_scope: Optional[str] = None,
+    use_cache: bool = True,
+) -> Story:
+    """Prints a story in the display_story layout while it is generated, then returns it parsed.
+
+    A reply without recognisable title or story sections is shown with display_story
+    once it is complete, so the screen never disagrees with the returned Story.
+    """
+    parser = StorySectionStream()
+    parts: List[str] = []
+    section = "preamble"
+    section_started = False
+    shown = False
+    # Trailing whitespace is held until more text arrives in the same section, so the
+    # newline before the next marker never pushes the separator rules down a line.
+    pending = ""
+
+    def write(piece_section: str, text: str) -> None:
+        nonlocal section, section_started, shown, pending
+        if piece_section != section:
+            if piece_section == "title":
+                sys.stdout.write("\n" + "=" * 60 + "\n")
+            elif piece_section == "story":
+                sys.stdout.write(("\n" if section == "title" else "\n" + "=" * 60 + "\n") + "=" * 60 + "\n\n")
+            elif piece_section == "moral":
+                sys.stdout.write("\n\n" + "-" * 60 + "\nMoral: ")
+            section, section_started, pending = piece_section, False, ""
+        if section == "preamble":
+            return
+        if not section_started:
+            text = text.lstrip()
+            section_started = bool(text)
+        body = text.rstrip()
+        if not body:
+            pending += text
+            return
+        if section in ("title", "story"):
+            shown = True
+        sys.stdout.write(pending + body)
+        sys.stdout.flush()
+        pending = text[len(body):]
+
+    async for fragment in call_model_stream(
+        prompt,
+        system_prompt,
+        max_tokens=STORY_MAX_TOKENS,
+        temperature=temperature,
+        cache_scope=cache_scope,
+        use_cache=use_cache,
+    ):
+        parts.append(fragment)
+        for piece in parser.feed(fragment):
+            write(*piece)
+    for piece in parser.close():
+        write(*piece)
+
+    title, content, moral = parse_story_response("".join(parts), fallback_title=fallback_title)
+    story = Story(title=title, content=content, moral=moral, version=version)
+    if shown:
+        print("\n" + "=" * 60 + "\n")
+    else:
+        display_story(story)
+    return story
 
 
 # Story Generation Pipeline
 
-def build_request_from_user_choices(user_input: str, category: StoryCategory, tone: str, setting: str) -> StoryRequest:
-    analyzed = analyze_request(user_input)
+async def build_request_from_user_choices(
+    user_input: str, category: StoryCategory, tone: str, setting: str
+) -> Tuple[StoryRequest, Optional[Story]]:
+    """Returns the request plus a first draft when the single-call path succeeds."""
+    try:
+        return await generate_story_with_analysis(user_input, category, tone, setting)
+    except ValueError:
+        pass
+
+    # Fall back to the separate analyzer; the draft is then written by generate_and_refine_story.
+    analyzed = await analyze_request(user_input)
 
     analyzed.category = category
     analyzed.tone = normalize_tone(tone)
     analyzed.setting = setting.strip() or analyzed.setting
 
-    return analyzed
+    return analyzed, None
 
 
-def generate_and_refine_story(request: StoryRequest, verbose: bool = True) -> Tuple[Story, List[JudgeFeedback]]:
+async def generate_and_refine_story(
+    request: StoryRequest,
+    verbose: bool = True,
+    initial_story: Optional[Story] = None,
+    fresh: bool = False,
+) -> Tuple[Story, List[JudgeFeedback]]:
     if verbose:
         print("\nStory request details:")
         print(f"   Category: {request.category.value}")
@@ -777,50 +1431,236 @@ def generate_and_refine_story(request: StoryRequest, verbose: bool = True) -> Tu
         if request.themes:
             print(f"   Themes: {', '.join(request.themes)}")
 
-    if verbose:
-        print("\nCrafting your story...")
-    story = generate_story(request)
+    if initial_story is not None:
+        story = initial_story
+    else:
+        if verbose:
+            print("\nCrafting your story...")
+        story = await generate_story(request, fresh=fresh, stream=verbose)
 
     history: List[JudgeFeedback] = []
+    best_story, best_score = story, 0
     for iteration in range(MAX_REFINEMENT_ITERATIONS):
         round_num = iteration + 1
         if verbose:
             print(f"\nJudge reviewing story (round {round_num})...")
 
-        feedback = judge_story(story, request, round_num=round_num, history=history)
+        # Every round but the last asks for the revision in the same call as the
+        # verdict, so a failing score does not cost a second round-trip.
+        revise = iteration < MAX_REFINEMENT_ITERATIONS - 1
+        revised: Optional[Story] = None
+        if revise:
+            feedback, revised = await judge_and_refine(story, request, round_num, history)
+        else:
+            feedback = await judge_story(story, request, round_num=round_num, history=history)
         history.append(feedback)
 
+        score = feedback.overall_score
+        if score >= best_score:
+            # Ties go to the later revision, which has had more feedback applied.
+            best_story, best_score = story, score
+
+        stop_message = ""
+        if score >= JUDGE_THRESHOLD:
+            stop_message = f"   Reached threshold ({JUDGE_THRESHOLD}/10). Stopping early."
+        elif len(history) >= 2 and score < history[-2].overall_score - 1:
+            stop_message = "   Score regressed. Stopping early."
+        elif len(history) >= 3 and score <= max(h.overall_score for h in history[-3:-1]):
+            stop_message = "   Score plateaued. Stopping early."
+
+        # Only a reply without a usable revision needs a separate refine call; start
+        # it before printing the feedback so the round-trip overlaps the display.
+        refine_task: Optional[asyncio.Task] = None
+        if not stop_message and revise and revised is None:
+            refine_task = asyncio.create_task(refine_story(story, request, list(history)))
+
         display_judge_feedback(feedback, show_details=verbose)
 
-        if feedback.overall_score >= JUDGE_THRESHOLD:
+        if stop_message:
             if verbose:
-                print(f"   Reached threshold ({JUDGE_THRESHOLD}/10). Stopping early.")
+                print(stop_message)
             break
 
-        if iteration < MAX_REFINEMENT_ITERATIONS - 1:
+        if revise:
             if verbose:
                 print("   Refining story based on feedback...")
-            story = refine_story(story, request, history)
+            if refine_task is not None:
+                story = await refine_task
+            else:
+                assert revised is not None
+                story = revised
         else:
             if verbose:
                 print("   Story refinement complete (max rounds reached).")
 
-    return story, history
+    if best_story is not story and verbose:
+        print(f"   Keeping the best-scoring version ({best_score}/10).")
+    return best_story, history
 
 
 # Main Interactive Loop
 
-def main():
+def _keeps_title_char(c: str) -> bool:
+    return c.isalnum() or c.isspace() or c in "-_"
+
+
+# Deletes every ASCII character _keeps_title_char rejects; non-ASCII titles use the filter.
+_TITLE_TRANS = str.maketrans("", "", "".join(chr(i) for i in range(128) if not _keeps_title_char(chr(i))))
+
+
+def _sanitize_title(title: str) -> str:
+    """Drops everything except letters, digits, underscores, whitespace, and hyphens."""
+    if title.isascii():
+        return title.translate(_TITLE_TRANS)
+    return "".join(c for c in title if _keeps_title_char(c))
+
+
+def _save_story(story: Story) -> str:
+    """Writes the story to a text file named after its title and returns the filename."""
+    safe_title = _sanitize_title(story.title).strip().replace(" ", "_")
+    filename = f"{safe_title}.txt" if safe_title else "story.txt"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(story.save_text)
+    return filename
+
+
+_SETTINGS = (
+    "a magical forest with enchanted trees",
+    "under the sea with colorful coral reefs",
+    "a cozy village where everyone is friendly",
+    "outer space among twinkling stars and friendly planets",
+    "a sunny farm with happy animals",
+    "a grand castle in a peaceful kingdom",
+    "a lush jungle full of wonder",
+    "the snowy Arctic with playful polar animals",
+    "a child's bedroom where toys come to life",
+)
+
+
+@dataclass
+class MenuContext:
+    """State shared by the post-story menu handlers."""
+    story: Story
+    request: StoryRequest
+    history: List[JudgeFeedback]
+
+
+# What the post-story menu does after a handler returns.
+_STAY = "stay"
+_NEW_IDEA = "new_idea"
+_EXIT = "exit"
+
+
+async def _cmd_finish(ctx: MenuContext) -> str:
+    save_choice = (await read_input("\nWould you like to save this story to a file? (y/n): ")).strip().lower()
+    if save_choice in ["y", "yes"]:
+        try:
+            filename = _save_story(ctx.story)
+            print(f"\nStory saved to: {filename}")
+        except Exception as e:
+            print(f"\nError saving file: {e}")
+
+    print("\nEnjoy the story! Sweet dreams!\n")
+    return _EXIT
+
+
+async def _cmd_listen(ctx: MenuContext) -> str:
+    print("\nEntering Bedtime Reading Mode...")
+    print("(Press Ctrl+C to skip ahead to the rest of the story)\n")
+    # asyncio.run installs a SIGINT handler that only cancels the main task, which would
+    # let the blocking narration run to the end; restore plain KeyboardInterrupt for it.
+    previous_handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        time.sleep(1)
+        speak_story(ctx.story, speed=0.3)
+    except KeyboardInterrupt:
+        print("\n\nSkipped to the end!\n")
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    print("\nSweet dreams!\n")
+    return _NEW_IDEA
+
+
+async def _cmd_modify(ctx: MenuContext) -> str:
+    modification = (await read_input("\nWhat changes would you like? ")).strip()
+    if modification:
+        try:
+            ctx.story = await apply_user_modification(ctx.story, ctx.request, modification, stream=True)
+        except Exception as e:
+            print(f"\nError applying changes: {e}\n")
+    return _STAY
+
+
+async def _cmd_regenerate(ctx: MenuContext) -> str:
+    print("\nGenerating a fresh story with the same request...")
+    try:
+        # The user asked for a new version, so never serve the draft from cache.
+        ctx.story, ctx.history = await generate_and_refine_story(ctx.request, verbose=True, fresh=True)
+        display_story(ctx.story)
+    except Exception as e:
+        print(f"\nError generating new version: {e}\n")
+    return _STAY
+
+
+async def _cmd_start_over(ctx: MenuContext) -> str:
+    return _NEW_IDEA
+
+
+async def _cmd_choice_mode(ctx: MenuContext) -> str:
+    try:
+        ctx.story = await run_interactive_choice_mode(ctx.story, ctx.request, total_steps=CHOICE_MODE_MAX_STEPS)
+        display_story(ctx.story)
+
+        # After Interactive Choice Mode, automatically save and finish.
+        filename = _save_story(ctx.story)
+        print(f"\nStory saved to: {filename}")
+        print("\nEnjoy the story! Sweet dreams!\n")
+        return _EXIT
+    except Exception as e:
+        print(f"\nError during Interactive Choice Mode or saving: {e}\n")
+    return _STAY
+
+
+_CMDS = {
+    "1": _cmd_finish,
+    "2": _cmd_listen,
+    "3": _cmd_modify,
+    "4": _cmd_regenerate,
+    "5": _cmd_start_over,
+    "6": _cmd_choice_mode,
+}
+_MENU_CHOICES = frozenset(_CMDS)
+
+
+async def _read_choice(prompt: str, valid: frozenset) -> str:
+    """Prompts until the answer is one of valid."""
+    options = sorted(valid)
+    retry = f"Please enter {', '.join(options[:-1])}, or {options[-1]}."
+    while True:
+        choice = (await read_input(prompt)).strip()
+        if choice in valid:
+            return choice
+        print(retry)
+
+
+async def main():
     print("\n" + "=" * 60)
     print("BEDTIME STORY GENERATOR")
     print("For children ages 5-10")
     print("=" * 60)
     print("\nType 'quit' at any time to exit.\n")
 
+    prewarm: Optional[asyncio.Task] = None
     while True:
-        user_input = input("What is your story idea? (e.g., 'a brave dragon', 'a lost teddy bear'): ").strip()
+        # The menu prompts below keep the event loop running, so the TLS handshake
+        # happens while the user is still typing instead of on the first model call.
+        if prewarm is None or prewarm.done():
+            prewarm = asyncio.create_task(prewarm_connection())
+
+        user_input = (await read_input("What is your story idea? (e.g., 'a brave dragon', 'a lost teddy bear'): ")).strip()
 
         if user_input.lower() in ["quit", "exit", "q"]:
+            await cancel_tasks([prewarm])
             print("\nSweet dreams! Goodnight!\n")
             break
 
@@ -837,7 +1677,7 @@ def main():
         print("  [6] Educational - Learning woven into the story")
         print("  [7] Funny - Silly situations and gentle humor")
 
-        category_choice = input("\nCategory (1-7): ").strip()
+        category_choice = (await read_input("\nCategory (1-7): ")).strip()
         category_map = {
             "1": StoryCategory.ADVENTURE,
             "2": StoryCategory.FANTASY,
@@ -857,7 +1697,7 @@ def main():
         print("  [5] Heartwarming - Touching and emotional")
         print("  [6] Inspiring - Uplifting and motivational")
 
-        tone_choice = input("\nTone (1-6): ").strip()
+        tone_choice = (await read_input("\nTone (1-6): ")).strip()
         tone_map = {
             "1": "whimsical",
             "2": "exciting",
@@ -879,22 +1719,17 @@ def main():
         print("  [8] Arctic - Snowy landscapes with polar animals")
         print("  [9] Child's bedroom - Toys and imagination come alive")
 
-        setting_choice = input("\nSetting (1-9): ").strip()
-        setting_map = {
-            "1": "a magical forest with enchanted trees",
-            "2": "under the sea with colorful coral reefs",
-            "3": "a cozy village where everyone is friendly",
-            "4": "outer space among twinkling stars and friendly planets",
-            "5": "a sunny farm with happy animals",
-            "6": "a grand castle in a peaceful kingdom",
-            "7": "a lush jungle full of wonder",
-            "8": "the snowy Arctic with playful polar animals",
-            "9": "a child's bedroom where toys come to life",
-        }
-        setting = setting_map.get(setting_choice, "a magical land")
+        setting_choice = (await read_input("\nSetting (1-9): ")).strip()
+        try:
+            index = int(setting_choice) - 1
+        except ValueError:
+            index = -1
+        setting = _SETTINGS[index] if 0 <= index < len(_SETTINGS) else "a magical land"
 
+        print("\nAnalyzing your idea and drafting a story...")
+        draft: Optional[Story] = None
         try:
-            request = build_request_from_user_choices(user_input, category, tone, setting)
+            request, draft = await build_request_from_user_choices(user_input, category, tone, setting)
         except Exception as e:
             print(f"\nError analyzing request: {e}")
             print("Continuing with a simple fallback request.\n")
@@ -920,13 +1755,14 @@ def main():
         print("-" * 60)
 
         try:
-            story, history = generate_and_refine_story(request, verbose=True)
+            story, history = await generate_and_refine_story(request, verbose=True, initial_story=draft)
         except Exception as e:
             print(f"\nError generating story: {e}\n")
             continue
 
         display_story(story)
 
+        ctx = MenuContext(story=story, request=request, history=history)
         while True:
             print("Would you like to:")
             print("  [1] Finish (optionally save this story)")
@@ -936,90 +1772,22 @@ def main():
             print("  [5] Start over with a different story idea")
             print("  [6] Continue with Interactive Choice Mode (pick what happens next)")
 
-            choice = input("\nYour choice (1-6): ").strip()
-
-            if choice == "1":
-                save_choice = input("\nWould you like to save this story to a file? (y/n): ").strip().lower()
-                if save_choice in ["y", "yes"]:
-                    safe_title = re.sub(r"[^\w\s-]", "", story.title).strip().replace(" ", "_")
-                    filename = f"{safe_title}.txt" if safe_title else "story.txt"
-                    try:
-                        with open(filename, "w", encoding="utf-8") as f:
-                            f.write("=" * 60 + "\n")
-                            f.write(f"{story.title}\n")
-                            f.write("=" * 60 + "\n\n")
-                            f.write(story.content + "\n\n")
-                            f.write("-" * 60 + "\n")
-                            f.write(f"Moral: {story.moral}\n")
-                            f.write("=" * 60 + "\n")
-                        print(f"\nStory saved to: {filename}")
-                    except Exception as e:
-                        print(f"\nError saving file: {e}")
-
-                print("\nEnjoy the story! Sweet dreams!\n")
+            choice = await _read_choice("\nYour choice (1-6): ", _MENU_CHOICES)
+            action = await _CMDS[choice](ctx)
+            if action == _EXIT:
                 return
-
-            if choice == "2":
-                print("\nEntering Bedtime Reading Mode...")
-                print("(Press Ctrl+C to skip ahead if needed)\n")
-                time.sleep(1)
-                try:
-                    speak_story(story, speed=0.3)
-                except KeyboardInterrupt:
-                    print("\n\nSkipped to the end!\n")
-                print("\nSweet dreams!\n")
+            if action == _NEW_IDEA:
                 break
 
-            if choice == "6":
-                try:
-                    story = run_interactive_choice_mode(story, request, total_steps=CHOICE_MODE_MAX_STEPS)
-                    display_story(story)
-
-                    # After Interactive Choice Mode, automatically save and finish.
-                    safe_title = re.sub(r"[^\w\s-]", "", story.title).strip().replace(" ", "_")
-                    filename = f"{safe_title}.txt" if safe_title else "story.txt"
-                    with open(filename, "w", encoding="utf-8") as f:
-                        f.write("=" * 60 + "\n")
-                        f.write(f"{story.title}\n")
-                        f.write("=" * 60 + "\n\n")
-                        f.write(story.content + "\n\n")
-                        f.write("-" * 60 + "\n")
-                        f.write(f"Moral: {story.moral}\n")
-                        f.write("=" * 60 + "\n")
-
-                    print(f"\nStory saved to: {filename}")
-                    print("\nEnjoy the story! Sweet dreams!\n")
-                    return
-                except Exception as e:
-                    print(f"\nError during Interactive Choice Mode or saving: {e}\n")
-                continue
-
-            if choice == "3":
-                modification = input("\nWhat changes would you like? ").strip()
-                if modification:
-                    try:
-                        story = apply_user_modification(story, request, modification)
-                        display_story(story)
-                    except Exception as e:
-                        print(f"\nError applying changes: {e}\n")
-                continue
-
-            if choice == "4":
-                print("\nGenerating a fresh story with the same request...")
-                try:
-                    story, history = generate_and_refine_story(request, verbose=True)
-                    display_story(story)
-                except Exception as e:
-                    print(f"\nError generating new version: {e}\n")
-                continue
 
-            if choice == "5":
-                break
-
-            print("Please enter 1, 2, 3, 4, 5, or 6.\n")
+# Entry Point
 
+async def run():
+    try:
+        await main()
+    finally:
+        await http_client.aclose()
 
-# Entry Point
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(run())
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""Data model shared by the story pipeline and the response parsers."""
+
+from dataclasses import dataclass
+from enum import Enum
+from functools import cached_property
+from typing import List
+
+HEAVY_RULE = "=" * 60
+LIGHT_RULE = "-" * 60
+
+
+class StoryCategory(Enum):
+    ADVENTURE = "adventure"
+    FANTASY = "fantasy"
+    ANIMAL = "animal"
+    FRIENDSHIP = "friendship"
+    BEDTIME = "bedtime"
+    EDUCATIONAL = "educational"
+    FUNNY = "funny"
+
+
+@dataclass
+class StoryRequest:
+    raw_input: str
+    category: StoryCategory
+    characters: List[str]
+    themes: List[str]
+    setting: str
+    tone: str
+
+
+@dataclass
+class JudgeFeedback:
+    overall_score: int  # 1-10
+    age_appropriateness: int
+    engagement: int
+    moral_clarity: int
+    story_structure: int
+    language_quality: int
+    feedback: str
+    suggestions: List[str]
+
+
+@dataclass(frozen=True)
+class Story:
+    """Immutable so save_text can be cached; revisions are new Story objects."""
+    title: str
+    content: str
+    moral: str
+    version: int
+
+    @cached_property
+    def save_text(self) -> str:
+        """The story as written to a .txt file, also the body of the on-screen layout."""
+        return "\n".join((
+            HEAVY_RULE,
+            self.title,
+            HEAVY_RULE,
+            "",
+            self.content,
+            "",
+            LIGHT_RULE,
+            f"Moral: {self.moral}",
+            HEAVY_RULE,
+            "",
+        ))
@@ -0,0 +1,270 @@
+"""Parsers for LLM responses.
+
+Pure, fully annotated string processing kept apart from main.py so it can be
+compiled with mypyc (`mypyc parsers.py`); Python picks up the compiled module
+automatically when it sits next to this file.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import JudgeFeedback, Story
+
+
+def clamp_int(value: Any, lo: int, hi: int, default: int) -> int:
+    try:
+        v = int(value)
+        return max(lo, min(hi, v))
+    except Exception:
+        return default
+
+
+def safe_split_csv(text: str) -> List[str]:
+    if not text:
+        return []
+    return [x.strip() for x in text.split(",") if x.strip()]
+
+
+def coerce_str_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return safe_split_csv(value)
+    if isinstance(value, list):
+        return [str(x).strip() for x in value if str(x).strip()]
+    return []
+
+
+@lru_cache(maxsize=32)
+def normalize_tone(tone: str) -> str:
+    allowed = {"whimsical", "exciting", "calming", "humorous", "heartwarming", "inspiring"}
+    t = (tone or "").strip().lower()
+    return t if t in allowed else "whimsical"
+
+
+ANALYZER_KEYS = frozenset({"CATEGORY", "CHARACTERS", "THEMES", "SETTING", "TONE"})
+
+
+def parse_analyzer_response(response: str) -> Dict[str, str]:
+    parsed: Dict[str, str] = {}
+    for line in (response or "").splitlines():
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        key = key.strip()
+        if key not in ANALYZER_KEYS:
+            # The prompt asks for uppercase keys; only pay for case folding when the model ignores that.
+            key = key.upper()
+            if key not in ANALYZER_KEYS:
+                continue
+        parsed[key] = value.strip()
+    return parsed
+
+
+# A section marker is TITLE/STORY/MORAL at the start of a line (markdown bold/headers
+# allowed) followed by a colon or the end of the line. The streaming display in main
+# splits on the same pattern so the screen always matches the parsed Story.
+SECTION_MARKER_RE = re.compile(r"^[ \t*#]*(TITLE|STORY|MORAL)\b[ \t*#]*(?::|$)[ \t*]*", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_story_response(response: str, fallback_title: str = "Untitled Story") -> Tuple[str, str, str]:
+    text = response or ""
+
+    matches = list(SECTION_MARKER_RE.finditer(text))
+    preamble = text[:matches[0].start()] if matches else text
+    sections: Dict[str, str] = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.setdefault(m.group(1).upper(), text[m.end():end])
+
+    title_line, _, title_rest = sections.get("TITLE", "").strip().partition("\n")
+    title = title_line.strip() or fallback_title
+    moral = sections.get("MORAL", "").strip()
+
+    content = sections.get("STORY", "").strip()
+    if not content:
+        # No usable STORY section: whatever is not the title line or the moral is the story.
+        content = (preamble + "\n" + title_rest).strip()
+
+    return title, content, moral
+
+
+# One alternation covers all six score fields so the judge output is scanned once.
+_SCORE_LINE_RE = re.compile(
+    r"(OVERALL[_\s]?SCORE|AGE[_\s]?APPROPRIATENESS|ENGAGEMENT|MORAL[_\s]?CLARITY|STORY[_\s]?STRUCTURE|LANGUAGE[_\s]?QUALITY)"
+    r"\s*:?\s*(\d+)",
+    re.IGNORECASE,
+)
+_SCORE_KEY_STRIP = str.maketrans("", "", "_ \t\r\n\f\v")
+_FEEDBACK_RE = re.compile(
+    r"(?:FEEDBACK|Feedback)\s*:?\s*(.*?)(?=(?:SUGGESTIONS|Suggestions)\s*:|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_SUGGESTIONS_RE = re.compile(r"(?:SUGGESTIONS|Suggestions)\s*:?\s*(.*?)$", re.IGNORECASE | re.DOTALL)
+_BULLET_RE = re.compile(r"[-•*]\s*(.+)")
+
+
+def load_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Returns the decoded object if the text is a JSON object, otherwise None."""
+    stripped = (text or "").strip()
+    if not stripped.startswith("{"):
+        return None
+    try:
+        data = json.loads(stripped)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def judge_feedback_from_dict(data: Dict[str, Any]) -> JudgeFeedback:
+    return JudgeFeedback(
+        overall_score=clamp_int(data.get("overall_score"), 1, 10, 5),
+        age_appropriateness=clamp_int(data.get("age_appropriateness"), 1, 10, 5),
+        engagement=clamp_int(data.get("engagement"), 1, 10, 5),
+        moral_clarity=clamp_int(data.get("moral_clarity"), 1, 10, 5),
+        story_structure=clamp_int(data.get("story_structure"), 1, 10, 5),
+        language_quality=clamp_int(data.get("language_quality"), 1, 10, 5),
+        feedback=str(data.get("feedback") or "").strip(),
+        suggestions=coerce_str_list(data.get("suggestions")),
+    )
+
+
+def parse_judge_response(response: str) -> JudgeFeedback:
+    """Reads the judge's JSON reply, falling back to the line-based format for non-JSON output.
+
+    Raises ValueError for a reply that starts as JSON but does not decode (usually cut off
+    at max_tokens); the line parser would silently turn it into default scores.
+    """
+    text = response or ""
+
+    data = load_json_object(text)
+    if data is not None:
+        return judge_feedback_from_dict(data)
+    if text.lstrip().startswith("{"):
+        raise ValueError("Judge reply is malformed or truncated JSON")
+
+    scores: Dict[str, int] = {}
+    for m in _SCORE_LINE_RE.finditer(text):
+        key = m.group(1).translate(_SCORE_KEY_STRIP).upper()
+        # First occurrence wins, matching a plain search per field.
+        scores.setdefault(key, clamp_int(m.group(2), 1, 10, 5))
+
+    feedback_match = _FEEDBACK_RE.search(text)
+    feedback = feedback_match.group(1).strip() if feedback_match else ""
+
+    suggestions: List[str] = []
+    suggestions_match = _SUGGESTIONS_RE.search(text)
+    if suggestions_match:
+        suggestions_text = suggestions_match.group(1).strip()
+        bullet_lines = _BULLET_RE.findall(suggestions_text)
+        suggestions = [s.strip() for s in bullet_lines if s.strip()]
+        if not suggestions and suggestions_text:
+            suggestions = [suggestions_text]
+
+    return JudgeFeedback(
+        overall_score=scores.get("OVERALLSCORE", 5),
+        age_appropriateness=scores.get("AGEAPPROPRIATENESS", 5),
+        engagement=scores.get("ENGAGEMENT", 5),
+        moral_clarity=scores.get("MORALCLARITY", 5),
+        story_structure=scores.get("STORYSTRUCTURE", 5),
+        language_quality=scores.get("LANGUAGEQUALITY", 5),
+        feedback=feedback,
+        suggestions=suggestions,
+    )
+
+
+def parse_judge_and_refine_response(response: str, fallback_title: str, version: int) -> Tuple[JudgeFeedback, Optional[Story]]:
+    """Splits a combined judge+revision reply; a non-JSON reply is read as judge output alone.
+
+    Raises ValueError for truncated JSON or a reply without a "judge" object, so the
+    scores are never made up.
+    """
+    data = load_json_object(response)
+    if data is None:
+        return parse_judge_response(response), None
+
+    judge = data.get("judge")
+    if not isinstance(judge, dict):
+        raise ValueError('Combined judge reply has no "judge" object')
+    feedback = judge_feedback_from_dict(judge)
+
+    revised = data.get("revised_story")
+    if not isinstance(revised, dict) or not str(revised.get("content") or "").strip():
+        return feedback, None
+    story = Story(
+        title=str(revised.get("title") or "").strip() or fallback_title,
+        content=str(revised["content"]).strip(),
+        moral=str(revised.get("moral") or "").strip(),
+        version=version,
+    )
+    return feedback, story
+
+
+_CHOICE1_RE = re.compile(r"CHOICE_1\s*:\s*(.+)", re.IGNORECASE)
+_CHOICE2_RE = re.compile(r"CHOICE_2\s*:\s*(.+)", re.IGNORECASE)
+_NUMBERED_RE = re.compile(r"^\s*[12][\)\.]\s*")
+
+
+def parse_choice_proposal(text: str) -> Tuple[str, str]:
+    c1_match = _CHOICE1_RE.search(text or "")
+    c2_match = _CHOICE2_RE.search(text or "")
+    c1 = (c1_match.group(1).strip() if c1_match else "")
+    c2 = (c2_match.group(1).strip() if c2_match else "")
+
+    # Fallback: try numbered lines
+    if not c1 or not c2:
+        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+        numbered = [_NUMBERED_RE.sub("", ln).strip() for ln in lines if _NUMBERED_RE.match(ln)]
+        if len(numbered) >= 2:
+            c1, c2 = numbered[0], numbered[1]
+
+    # Last-resort defaults
+    if not c1:
+        c1 = "Follow a trail of twinkling lights to see where it leads."
+    if not c2:
+        c2 = "Ask a friendly neighbor for help and a cozy hint."
+
+    return c1, c2
+
+
+_CONT_RE = re.compile(r"(?:CONTINUATION)\s*:?(.*?)(?=(?:MORAL)\s*:|$)", re.IGNORECASE | re.DOTALL)
+_CONT_MORAL_RE = re.compile(r"(?:MORAL)\s*:?(.*)$", re.IGNORECASE | re.DOTALL)
+_CONT_PREFIX_RE = re.compile(r"^CONTINUATION\s*:?", re.IGNORECASE)
+
+
+def parse_continuation_response(text: str) -> Tuple[str, str]:
+    """Returns (continuation_text, moral_or_empty)."""
+    t = text or ""
+
+    cont_match = _CONT_RE.search(t)
+    moral_match = _CONT_MORAL_RE.search(t)
+
+    continuation = cont_match.group(1).strip() if cont_match and cont_match.group(1).strip() else t.strip()
+    continuation = _CONT_PREFIX_RE.sub("", continuation).strip()
+    moral = moral_match.group(1).strip() if moral_match else ""
+
+    return continuation, moral
+
+
+# "change Alice to Bob", "replace the name \"Mr. Owl\" with \"Hoot\"", "rename Ember to Flicker".
+# Unquoted names must be capitalized so instructions like "change the ending to happy" never match.
+_LITERAL_SUB_RE = re.compile(
+    r"\s*(?i:please\s+)?(?i:change|replace|rename)\s+"
+    r"(?i:the\s+)?(?i:(?:main\s+)?character(?:'s)?\s+)?(?i:name\s+)?(?i:(?:from|of)\s+)?"
+    r"(?:[\"“]([^\"”]+)[\"”]|([A-Z][\w'-]*))"
+    r"\s+(?i:to|with|into)\s+"
+    r"(?:[\"“]([^\"”]+)[\"”]|([A-Z][\w'-]*))"
+    r"\s*[.!]?\s*"
+)
+
+
+def parse_literal_substitution(text: str) -> Optional[Tuple[str, str]]:
+    """Returns (old, new) when the whole instruction is a plain rename, else None."""
+    m = _LITERAL_SUB_RE.fullmatch(text)
+    if not m:
+        return None
+    old = (m.group(1) or m.group(2)).strip()
+    new = (m.group(3) or m.group(4)).strip()
+    if not old or not new or old == new:
+        return None
+    return old, new